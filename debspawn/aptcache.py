@@ -42,21 +42,34 @@ class APTCache:
         from string import digits, ascii_lowercase
 
         Path(self._cache_dir).mkdir(parents=True, exist_ok=True)
-        for pkg_fname in glob(os.path.join(tmp_cache_dir, '*.deb')):
-            pkg_basename = os.path.basename(pkg_fname)
-            pkg_cachepath = os.path.join(self._cache_dir, pkg_basename)
-
-            if not os.path.isfile(pkg_cachepath):
-                pkg_tmp_name = (
-                    pkg_cachepath + '.tmp-' + ''.join(choice(ascii_lowercase + digits) for _ in range(8))
-                )
-                shutil.copy2(pkg_fname, pkg_tmp_name)
+        with os.scandir(self._cache_dir) as it:
+            cached_names = {e.name for e in it}
+        with os.scandir(tmp_cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith('.deb') or entry.name in cached_names:
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                pkg_cachepath = os.path.join(self._cache_dir, entry.name)
+
+                # hardlinking is cheap and atomic, and will fail if some other debspawn
+                # instance has added the package already
                 try:
-                    os.rename(pkg_tmp_name, pkg_cachepath)
+                    os.link(entry.path, pkg_cachepath)
+                except FileExistsError:
+                    pass
                 except OSError:
-                    # maybe some other debspawn instance tried to add the package just now,
-                    # in that case we give up
-                    os.remove(pkg_tmp_name)
+                    # most likely the cache is on a different filesystem, so we need to copy
+                    pkg_tmp_name = (
+                        pkg_cachepath + '.tmp-' + ''.join(choice(ascii_lowercase + digits) for _ in range(8))
+                    )
+                    shutil.copy2(entry.path, pkg_tmp_name)
+                    try:
+                        os.rename(pkg_tmp_name, pkg_cachepath)
+                    except OSError:
+                        # maybe some other debspawn instance tried to add the package just now,
+                        # in that case we give up
+                        os.remove(pkg_tmp_name)
 
     def create_instance_cache(self, tmp_cache_dir):
         '''
@@ -130,8 +130,8 @@ def interact_with_build_environment(
                 chdir=os.path.join('/srv/build', os.path.basename(pkg_dir)),
                 flags=nspawn_flags,
                 command=['dpkg-buildpackage', '-T', 'clean'],
-                tmp_apt_cache_dir=aptcache_tmp,
                 pkginjector=pkginjector,
+                use_apt_cache=False,
             )
 
             print()
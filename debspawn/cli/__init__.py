@@ -18,21 +18,69 @@
 # along with this software.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import re
 import sys
-import logging as log
-from argparse import HelpFormatter, ArgumentParser
+from argparse import HelpFormatter, ArgumentParser, ArgumentTypeError
+from functools import wraps, lru_cache
 
-from .utils import print_error
-from .config import GlobalConfig
-from .osbase import OSBase
-from .utils.env import set_owning_user, set_unicode_allowed
+from ..utils import print_warn, print_error
+
+
+def _csv(value):
+    '''Split a comma-separated list, stripping whitespace from the items.'''
+    return [s.strip() for s in value.split(',')] if value else []
+
+
+def _semi(value):
+    '''Split a semicolon-separated list.'''
+    return value.split(';') if value else []
+
+
+def _space(value):
+    '''Split a whitespace-separated list.'''
+    return value.split() if value else []
+
+
+def _owner(value):
+    '''Parse a user[:group] pair, an empty value means no owner was set.'''
+    if not value:
+        return None
+    user, sep, group = value.partition(':')
+    if ':' in group:
+        raise ArgumentTypeError('You can only use one colon to split user:group when using the --owner flag.')
+    return (user, group if sep else None)
+
+
+_UTF8_RE = re.compile(r'utf-?8', re.IGNORECASE)
+
+
+@lru_cache(maxsize=1)
+def _environment_is_utf8():
+    '''Return the preferred encoding of the current environment, and whether it is UTF-8.'''
+
+    # avoid importing the locale module if our environment already tells us we use UTF-8.
+    # LC_ALL overrides LC_CTYPE, which overrides LANG, so only the first one set is relevant
+    env_locale = next(
+        (os.environ[name] for name in ('LC_ALL', 'LC_CTYPE', 'LANG') if os.environ.get(name)), ''
+    )
+    if _UTF8_RE.search(env_locale):
+        return 'utf-8', True
+
+    import locale
+
+    encoding = locale.getpreferredencoding()
+    return encoding, bool(_UTF8_RE.fullmatch(encoding))
 
 
 def init_config(options):
     '''
     Create a new :GlobalConfig from command-line options.
     '''
-    gconf = GlobalConfig()
+    from ..config import GlobalConfig
+    from ..utils.env import set_owning_user, set_unicode_allowed
+
+    # loading is a no-op if this configuration file was already loaded before
+    gconf = GlobalConfig(options.config)
     gconf.load(options.config)
 
     # check if we are forbidden from using unicode - otherwise we build
@@ -40,11 +88,9 @@ def init_config(options):
     if options.no_unicode:
         set_unicode_allowed(False)
     else:
-        import locale
-
-        current_encoding = locale.getpreferredencoding()
-        if current_encoding.lower() != 'utf-8':
-            log.warning(
+        current_encoding, is_utf8 = _environment_is_utf8()
+        if not is_utf8:
+            print_warn(
                 (
                     'Building with unicode support, but your environment does not seem to support unicode. '
                     '(Encoding is {})'
@@ -53,276 +99,49 @@ def init_config(options):
         set_unicode_allowed(True)
 
     if options.owner:
-        info = options.owner.split(':')
-        if len(info) > 2:
-            print_error('You can only use one colon to split user:group when using the --owner flag.')
-            sys.exit(1)
-        if len(info) == 2:
-            user = info[0]
-            group = info[1]
-        else:
-            user = info[0]
-            group = None
+        user, group = options.owner
         set_owning_user(user, group)
 
     return gconf
 
 
-def check_print_version(options):
-    if options.show_version:
-        from . import __version__
-
-        print(__version__)
-        sys.exit(0)
-
-
-def command_create(options):
-    '''Create new container image'''
+def _osbase_from_opts(options, **kwargs):
+    '''
+    Load the configuration and create a new :OSBase for the container
+    image selected on the command-line.
+    '''
+    from ..osbase import OSBase
 
-    check_print_version(options)
-    if not options.name:
-        print_error('Need at least a container name (suite name) to bootstrap!')
-        sys.exit(1)
     gconf = init_config(options)
-
-    components = None
-    if options.components:
-        components = options.components.split(',')
-
-    extra_suites = []
-    if options.extra_suites:
-        extra_suites = options.extra_suites.strip().split(' ')
-
-    osbase = OSBase(
+    return OSBase(
         gconf,
         options.suite,
         options.arch,
         variant=options.variant,
-        base_suite=options.base_suite,
-        custom_name=options.name,
-    )
-    r = osbase.create(
-        options.mirror,
-        components,
-        extra_suites=extra_suites,
-        extra_source_lines=options.extra_source_lines,
-        allow_recommends=options.allow_recommends,
-        with_init=options.with_init,
-    )
-    if not r:
-        sys.exit(2)
-
-
-def command_delete(options):
-    '''Delete container image'''
-
-    check_print_version(options)
-    if not options.name:
-        print_error('No container image name was specified!')
-        sys.exit(1)
-    gconf = init_config(options)
-    osbase = OSBase(gconf, options.suite, options.arch, options.variant, custom_name=options.name)
-    r = osbase.delete()
-    if not r:
-        sys.exit(2)
-
-
-def command_update(options):
-    '''Update container image'''
-
-    check_print_version(options)
-    if not options.name:
-        print_error('Need at least a container image name for update!')
-        sys.exit(1)
-    gconf = init_config(options)
-    osbase = OSBase(gconf, options.suite, options.arch, options.variant, custom_name=options.name)
-    if options.recreate:
-        r = osbase.recreate()
-    else:
-        r = osbase.update()
-    if not r:
-        sys.exit(2)
-
-
-def command_list(options):
-    '''List container images'''
-
-    from .osbase import print_container_base_image_info
-
-    check_print_version(options)
-    gconf = init_config(options)
-    print_container_base_image_info(gconf)
-
-
-def command_build(options):
-    '''Build a package in a new volatile container'''
-
-    from .build import build_from_dsc, build_from_directory
-
-    check_print_version(options)
-    if not options.name:
-        print_error('Need at least a container image or suite name for building!')
-        sys.exit(1)
-    gconf = init_config(options)
-    osbase = OSBase(gconf, options.suite, options.arch, options.variant, custom_name=options.name)
-
-    # prepare user-defined environment variables
-    env_vars = {}
-    if options.env_vars:
-        for kv in options.env_vars:
-            p = kv.split('=', 1)
-            if len(p) != 2:
-                print('Environment variable definition `{}` is invalid!'.format(kv))
-                print('Can not continue.')
-                sys.exit(1)
-            env_vars[p[0]] = p[1]
-
-    # prepare user-defined buildflags
-    buildflags = []
-    if options.buildflags:
-        buildflags = options.buildflags.split(';')
-
-    if not options.target and os.path.isdir(options.name):
-        print(
-            'A directory is given as parameter, but you are missing a container-name parameter to build for.'
-        )
-        print('Can not continue.')
-        sys.exit(1)
-
-    # override globally configured output directory with
-    # a custom one defined on the CLI
-    if options.results_dir:
-        osbase.results_dir = options.results_dir
-
-    if not options.target or os.path.isdir(options.target):
-        r = build_from_directory(
-            osbase,
-            options.target,
-            sign=options.sign,
-            build_only=options.build_only,
-            include_orig=options.include_orig,
-            maintainer=options.maintainer,
-            clean_source=options.clean_source,
-            qa_lintian=options.lintian,
-            interact=options.interact,
-            log_build=not options.no_buildlog,
-            extra_dpkg_flags=buildflags,
-            build_env=env_vars,
-        )
-    else:
-        r = build_from_dsc(
-            osbase,
-            options.target,
-            sign=options.sign,
-            build_only=options.build_only,
-            include_orig=options.include_orig,
-            maintainer=options.maintainer,
-            qa_lintian=options.lintian,
-            interact=options.interact,
-            log_build=not options.no_buildlog,
-            extra_dpkg_flags=buildflags,
-            build_env=env_vars,
-        )
-    if not r:
-        sys.exit(2)
-
-
-def command_login(options):
-    '''Open interactive session in a container'''
-
-    check_print_version(options)
-    if not options.name:
-        print_error('Need at least a container image name!')
-        sys.exit(1)
-    gconf = init_config(options)
-    osbase = OSBase(gconf, options.suite, options.arch, options.variant, custom_name=options.name)
-
-    allowed = []
-    if options.allow:
-        allowed = [s.strip() for s in options.allow.split(',')]
-    r = osbase.login(options.persistent, allowed=allowed, boot=options.boot)
-    if not r:
-        sys.exit(2)
-
-
-def command_run(options, custom_command):
-    '''Run arbitrary command in container session'''
-
-    check_print_version(options)
-    if not options.name:
-        print_error('Need at least a container image name!')
-        sys.exit(1)
-    gconf = init_config(options)
-    osbase = OSBase(
-        gconf,
-        options.suite,
-        options.arch,
-        options.variant,
         custom_name=options.name,
-        cachekey=options.cachekey,
+        **kwargs,
     )
 
-    allowed = []
-    if options.allow:
-        allowed = [s.strip() for s in options.allow.split(',')]
-
-    bind_build_dir = options.bind_build_dir
-    if bind_build_dir == 'y':
-        bind_build_dir = 'ro'
-    elif bind_build_dir == 'rw' or bind_build_dir == 'ro':
-        pass
-    else:
-        bind_build_dir = 'n'
-
-    r = osbase.run(
-        custom_command,
-        options.build_dir,
-        options.artifacts_dir,
-        boot=options.boot,
-        init_command=options.init_command,
-        copy_command=options.external_commad,
-        header_msg=options.header,
-        bind_build_dir=bind_build_dir,
-        allowed=allowed,
-    )
-    if not r:
-        sys.exit(2)
-
-
-def command_maintain(options):
-    '''Execute global maintenance actions'''
-
-    check_print_version(options)
-    gconf = init_config(options)
-
-    if options.migrate:
-        from .maintain import maintain_migrate
 
-        maintain_migrate(gconf)
-        return
-    if options.clear_caches:
-        from .maintain import maintain_clear_caches
+def _exit_on_false(func):
+    '''Exit the program with an error code if the decorated command handler fails.'''
 
-        maintain_clear_caches(gconf)
-        return
-    if options.update_all:
-        from .maintain import maintain_update_all
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        r = func(*args, **kwargs)
+        if not r:
+            sys.exit(2)
+        return r
 
-        maintain_update_all(gconf)
-        return
-    if options.purge:
-        from .maintain import maintain_purge
+    return wrapper
 
-        maintain_purge(gconf, options.yes)
-        return
-    if options.status:
-        from .maintain import maintain_print_status
 
-        maintain_print_status(gconf)
-        return
+def check_print_version(options):
+    if options.show_version:
+        from .. import __version__
 
-    print_error('No maintenance action selected!')
-    sys.exit(1)
+        print(__version__)
+        sys.exit(0)
 
 
 class CustomArgparseFormatter(HelpFormatter):
@@ -359,37 +178,10 @@ def add_container_select_arguments(parser):
     )
 
 
-def create_parser(formatter_class=None):
-    '''Create debspawn CLI argument parser'''
+def _add_create_parser(subparsers, formatter_class):
+    '''Register the `create` subcommand.'''
 
-    if not formatter_class:
-        formatter_class = CustomArgparseFormatter
-
-    parser = ArgumentParser(description='Build in nspawn containers', formatter_class=formatter_class)
-    subparsers = parser.add_subparsers(dest='sp_name', title='subcommands')
-
-    # generic arguments
-    parser.add_argument(
-        '-c', '--config', action='store', dest='config', default=None, help='Path to the global config file.'
-    )
-    parser.add_argument('--verbose', action='store_true', dest='verbose', help='Enable debug messages.')
-    parser.add_argument(
-        '--no-unicode', action='store_true', dest='no_unicode', help='Disable unicode support.'
-    )
-    parser.add_argument(
-        '--version', action='store_true', dest='show_version', help='Display the version of debspawn itself.'
-    )
-
-    parser.add_argument(
-        '--owner',
-        action='store',
-        dest='owner',
-        default=None,
-        help=('Set the user name/uid and group/gid separated by a colon ' 'whose behalf we are acting.'),
-    )
-
-    # 'create' command
-    sp = subparsers.add_parser('create', help='Create new container image')
+    sp = subparsers.add_parser('create', allow_abbrev=False, help='Create new container image')
     add_container_select_arguments(sp)
     sp.add_argument(
         '--mirror',
@@ -402,6 +194,7 @@ def create_parser(formatter_class=None):
         '--components',
         action='store',
         dest='components',
+        type=_csv,
         default=None,
         help='A comma-separated list of archive components to enable in the newly created image.',
     )
@@ -419,7 +212,8 @@ def create_parser(formatter_class=None):
         '--extra-suites',
         action='store',
         dest='extra_suites',
-        default=None,
+        type=_space,
+        default=[],
         help=(
             'Space-separated list of additional suites that should also be added to the ' 'sources.list file.'
         ),
@@ -450,15 +244,19 @@ def create_parser(formatter_class=None):
         dest='with_init',
         help='Include an init system in this image, so it is bootable.',
     )
-    sp.set_defaults(func=command_create)
 
-    # 'delete' command
-    sp = subparsers.add_parser('delete', help='Remove a container image')
+
+def _add_delete_parser(subparsers, formatter_class):
+    '''Register the `delete` subcommand.'''
+
+    sp = subparsers.add_parser('delete', allow_abbrev=False, help='Remove a container image')
     add_container_select_arguments(sp)
-    sp.set_defaults(func=command_delete)
 
-    # 'update' command
-    sp = subparsers.add_parser('update', help='Update a container image')
+
+def _add_update_parser(subparsers, formatter_class):
+    '''Register the `update` subcommand.'''
+
+    sp = subparsers.add_parser('update', allow_abbrev=False, help='Update a container image')
     add_container_select_arguments(sp)
     sp.add_argument(
         '--recreate',
@@ -469,15 +267,20 @@ def create_parser(formatter_class=None):
             'instead of just updating it.'
         ),
     )
-    sp.set_defaults(func=command_update)
 
-    # 'list' command
-    sp = subparsers.add_parser('list', help='List available container images', aliases=['ls'])
-    sp.set_defaults(func=command_list)
 
-    # 'build' command
+def _add_list_parser(subparsers, formatter_class):
+    '''Register the `list` subcommand.'''
+
+    subparsers.add_parser('list', allow_abbrev=False, help='List available container images', aliases=['ls'])
+
+
+def _add_build_parser(subparsers, formatter_class):
+    '''Register the `build` subcommand.'''
+
     sp = subparsers.add_parser(
         'build',
+        allow_abbrev=False,
         help='Build a package in an isolated environment',
         formatter_class=formatter_class,
         aliases=['b'],
@@ -506,6 +309,8 @@ def create_parser(formatter_class=None):
         '--buildflags',
         action='store',
         dest='buildflags',
+        type=_semi,
+        default=[],
         help='Set flags passed through to dpkg-buildpackage as semicolon-separated list.',
     )
     sp.add_argument(
@@ -569,10 +374,12 @@ def create_parser(formatter_class=None):
         default=None,
         help='The source package file or source directory to build.',
     )
-    sp.set_defaults(func=command_build)
 
-    # 'login' command
-    sp = subparsers.add_parser('login', help='Open interactive session in a container')
+
+def _add_login_parser(subparsers, formatter_class):
+    '''Register the `login` subcommand.'''
+
+    sp = subparsers.add_parser('login', allow_abbrev=False, help='Open interactive session in a container')
     add_container_select_arguments(sp)
     sp.add_argument(
         '--persistent',
@@ -584,6 +391,8 @@ def create_parser(formatter_class=None):
         '--allow',
         action='store',
         dest='allow',
+        type=_csv,
+        default=[],
         help=(
             'List one or more additional permissions to grant the container. Takes a comma-separated '
             'list of capability names.'
@@ -595,10 +404,14 @@ def create_parser(formatter_class=None):
         dest='boot',
         help='Boot container image (requires the image to contain an init system).',
     )
-    sp.set_defaults(func=command_login)
 
-    # 'run' command
-    sp = subparsers.add_parser('run', help='Run arbitrary command in an ephemeral container')
+
+def _add_run_parser(subparsers, formatter_class):
+    '''Register the `run` subcommand.'''
+
+    sp = subparsers.add_parser(
+        'run', allow_abbrev=False, help='Run arbitrary command in an ephemeral container'
+    )
     add_container_select_arguments(sp)
     sp.add_argument(
         '--artifacts-out',
@@ -665,6 +478,8 @@ def create_parser(formatter_class=None):
         '--allow',
         action='store',
         dest='allow',
+        type=_csv,
+        default=[],
         help=(
             'List one or more additional permissions to grant the container. Takes a comma-separated '
             'list of capability names.'
@@ -678,8 +493,13 @@ def create_parser(formatter_class=None):
     )
     sp.add_argument('command', action='store', nargs='*', default=None, help='The command to run.')
 
-    # 'maintain' command
-    sp = subparsers.add_parser('maintain', help='Execute various maintenance actions, affecting all images')
+
+def _add_maintain_parser(subparsers, formatter_class):
+    '''Register the `maintain` subcommand.'''
+
+    sp = subparsers.add_parser(
+        'maintain', allow_abbrev=False, help='Execute various maintenance actions, affecting all images'
+    )
     sp.add_argument(
         '-y', '--yes', action='store_true', dest='yes', help='Perform dangerous actions without asking twice.'
     )
@@ -695,6 +515,14 @@ def create_parser(formatter_class=None):
         dest='update_all',
         help='Update all container images that we know.',
     )
+    sp.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=1,
+        dest='jobs',
+        help='Number of container images to update in parallel with --update-all.',
+    )
     sp.add_argument(
         '--clear-caches',
         action='store_true',
@@ -713,7 +541,114 @@ def create_parser(formatter_class=None):
         dest='status',
         help='Display a status summary about this installation, highlighting potential issues.',
     )
-    sp.set_defaults(func=command_maintain)
+
+
+_SUBCOMMANDS = {
+    'create': _add_create_parser,
+    'delete': _add_delete_parser,
+    'update': _add_update_parser,
+    'list': _add_list_parser,
+    'build': _add_build_parser,
+    'login': _add_login_parser,
+    'run': _add_run_parser,
+    'maintain': _add_maintain_parser,
+}
+
+# subcommand aliases
+_SUBCOMMAND_ALIASES = {'ls': 'list', 'b': 'build'}
+
+# module implementing the handler for each subcommand, imported only after parsing
+_HANDLERS = {
+    'create': 'debspawn.cli.create',
+    'delete': 'debspawn.cli.delete',
+    'update': 'debspawn.cli.update',
+    'list': 'debspawn.cli.list_cmd',
+    'build': 'debspawn.cli.build',
+    'login': 'debspawn.cli.login',
+    'run': 'debspawn.cli.run_cmd',
+    'maintain': 'debspawn.cli.maintain',
+}
+
+# generic options which consume the next argument as their value
+_GENERIC_VALUE_OPTIONS = ('-c', '--config', '--owner')
+
+
+def _sniff_subcommand(args):
+    '''
+    Find the name of the subcommand in :args, without running the full argument parser.
+    Returns None if no known subcommand could be found.
+    '''
+    skip_next = False
+    for arg in args:
+        if skip_next:
+            skip_next = False
+            continue
+        if arg.startswith('-'):
+            skip_next = arg in _GENERIC_VALUE_OPTIONS
+            continue
+        sp_name = _SUBCOMMAND_ALIASES.get(arg, arg)
+        return sp_name if sp_name in _SUBCOMMANDS else None
+    return None
+
+
+def _split_custom_command(args, active_sub):
+    '''
+    Split off the command to be executed by 'run', which follows a '---' separator, so we
+    know which arguments are for debspawn and which are for the command.
+    Returns a tuple of the remaining arguments and the custom command (or None).
+    '''
+    if active_sub != 'run':
+        return args, None
+    try:
+        i = args.index('---')
+    except ValueError:
+        return args, None
+
+    custom_command = args[i + 1 :]
+    if not custom_command:
+        print_error('No command was given after "---", can not continue.')
+        sys.exit(1)
+    return args[:i], custom_command
+
+
+def create_parser(formatter_class=None, active_sub=None):
+    '''
+    Create debspawn CLI argument parser.
+    If :active_sub is set, only the parser for this subcommand is registered.
+    '''
+
+    if not formatter_class:
+        formatter_class = CustomArgparseFormatter
+
+    parser = ArgumentParser(
+        description='Build in nspawn containers', allow_abbrev=False, formatter_class=formatter_class
+    )
+    subparsers = parser.add_subparsers(dest='sp_name', title='subcommands')
+
+    # generic arguments
+    parser.add_argument(
+        '-c', '--config', action='store', dest='config', default=None, help='Path to the global config file.'
+    )
+    parser.add_argument('--verbose', action='store_true', dest='verbose', help='Enable debug messages.')
+    parser.add_argument(
+        '--no-unicode', action='store_true', dest='no_unicode', help='Disable unicode support.'
+    )
+    parser.add_argument(
+        '--version', action='store_true', dest='show_version', help='Display the version of debspawn itself.'
+    )
+
+    parser.add_argument(
+        '--owner',
+        action='store',
+        dest='owner',
+        type=_owner,
+        default=None,
+        help=('Set the user name/uid and group/gid separated by a colon ' 'whose behalf we are acting.'),
+    )
+
+    for sp_name, add_parser_fn in _SUBCOMMANDS.items():
+        if not active_sub or active_sub == sp_name:
+            add_parser_fn(subparsers, formatter_class)
 
     return parser
 
@@ -723,29 +658,29 @@ def run(mainfile, args):
         print_error('Need a subcommand to proceed!')
         sys.exit(1)
 
-    parser = create_parser()
-
-    # special case, so 'run' can understand which arguments are for debspawn and which are
-    # for the command to be executed
-    custom_command = None
-    if args[0] == 'run':
-        for i, arg in enumerate(args):
-            if arg == '---':
-                if i + 1 == len(args):
-                    print_error('No command was given after "---", can not continue.')
-                    sys.exit(1)
-                custom_command = args[i + 1 :]
-                args = args[:i]
-                break
+    # fast path: no need to build a parser just to display our version
+    if args[0] == '--version':
+        from .. import __version__
+
+        print(__version__)
+        sys.exit(0)
+
+    active_sub = _sniff_subcommand(args)
+    parser = create_parser(active_sub=active_sub)
+    args, custom_command = _split_custom_command(args, active_sub)
 
     args = parser.parse_args(args)
     check_print_version(args)
+    if not args.sp_name:
+        print_error('Unknown or no subcommand was provided. Can not proceed.')
+        sys.exit(1)
+
+    from importlib import import_module
+
+    handler = import_module(_HANDLERS[_SUBCOMMAND_ALIASES.get(args.sp_name, args.sp_name)]).command
     if args.sp_name == 'run':
         if not custom_command:
             custom_command = args.command
-        command_run(args, custom_command)
+        handler(args, custom_command)
     else:
-        if not hasattr(args, 'func'):
-            print_error('Unknown or no subcommand was provided. Can not proceed.')
-            sys.exit(1)
-        args.func(args)
+        handler(args)
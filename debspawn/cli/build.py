@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018-2022 Matthias Klumpp <matthias@tenstral.net>
+#
+# Licensed under the GNU Lesser General Public License Version 3
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the license, or
+# (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this software.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+
+from . import _exit_on_false, _osbase_from_opts, check_print_version
+from ..utils import print_error
+
+
+@_exit_on_false
+def command(options):
+    '''Build a package in a new volatile container'''
+
+    check_print_version(options)
+    if not options.name:
+        print_error('Need at least a container image or suite name for building!')
+        sys.exit(1)
+
+    # prepare user-defined environment variables
+    env_vars = {}
+    if options.env_vars:
+        for kv in options.env_vars:
+            p = kv.split('=', 1)
+            if len(p) != 2:
+                print('Environment variable definition `{}` is invalid!'.format(kv))
+                print('Can not continue.')
+                sys.exit(1)
+            env_vars[p[0]] = p[1]
+
+    if not options.target and os.path.isdir(options.name):
+        print(
+            'A directory is given as parameter, but you are missing a container-name parameter to build for.'
+        )
+        print('Can not continue.')
+        sys.exit(1)
+
+    osbase = _osbase_from_opts(options)
+
+    # override globally configured output directory with
+    # a custom one defined on the CLI
+    if options.results_dir:
+        osbase.results_dir = options.results_dir
+
+    from ..build import build_from_dsc, build_from_directory
+
+    if not options.target or os.path.isdir(options.target):
+        return build_from_directory(
+            osbase,
+            options.target,
+            sign=options.sign,
+            build_only=options.build_only,
+            include_orig=options.include_orig,
+            maintainer=options.maintainer,
+            clean_source=options.clean_source,
+            qa_lintian=options.lintian,
+            interact=options.interact,
+            log_build=not options.no_buildlog,
+            extra_dpkg_flags=options.buildflags,
+            build_env=env_vars,
+        )
+    return build_from_dsc(
+        osbase,
+        options.target,
+        sign=options.sign,
+        build_only=options.build_only,
+        include_orig=options.include_orig,
+        maintainer=options.maintainer,
+        qa_lintian=options.lintian,
+        interact=options.interact,
+        log_build=not options.no_buildlog,
+        extra_dpkg_flags=options.buildflags,
+        build_env=env_vars,
+    )
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018-2022 Matthias Klumpp <matthias@tenstral.net>
+#
+# Licensed under the GNU Lesser General Public License Version 3
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the license, or
+# (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this software.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+
+from . import _exit_on_false, _osbase_from_opts, check_print_version
+from ..utils import print_error
+
+
+@_exit_on_false
+def command(options):
+    '''Create new container image'''
+
+    check_print_version(options)
+    if not options.name:
+        print_error('Need at least a container name (suite name) to bootstrap!')
+        sys.exit(1)
+    osbase = _osbase_from_opts(options, base_suite=options.base_suite)
+    return osbase.create(
+        options.mirror,
+        options.components,
+        extra_suites=options.extra_suites,
+        extra_source_lines=options.extra_source_lines,
+        allow_recommends=options.allow_recommends,
+        with_init=options.with_init,
+    )
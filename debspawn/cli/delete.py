@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018-2022 Matthias Klumpp <matthias@tenstral.net>
+#
+# Licensed under the GNU Lesser General Public License Version 3
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the license, or
+# (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this software.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+
+from . import _exit_on_false, _osbase_from_opts, check_print_version
+from ..utils import print_error
+
+
+@_exit_on_false
+def command(options):
+    '''Delete container image'''
+
+    check_print_version(options)
+    if not options.name:
+        print_error('No container image name was specified!')
+        sys.exit(1)
+    osbase = _osbase_from_opts(options)
+    return osbase.delete()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2018-2022 Matthias Klumpp <matthias@tenstral.net>
+#
+# Licensed under the GNU Lesser General Public License Version 3
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the license, or
+# (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this software.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+
+from . import init_config, check_print_version
+from ..utils import print_error
+
+
+def command(options):
+    '''Execute global maintenance actions'''
+
+    check_print_version(options)
+    gconf = init_config(options)
+
+    if options.migrate:
+        from ..maintain import maintain_migrate
+
+        maintain_migrate(gconf)
+        return
+    if options.clear_caches:
+        from ..maintain import maintain_clear_caches
+
+        maintain_clear_caches(gconf)
+        return
+    if options.update_all:
+        from ..maintain import maintain_update_all
+
+        maintain_update_all(gconf, jobs=options.jobs)
+        return
+    if options.purge:
+        from ..maintain import maintain_purge
+
+        maintain_purge(gconf, options.yes)
+        return
+    if options.status:
+        from ..maintain import maintain_print_status
+
+        maintain_print_status(gconf)
+        return
+
+    print_error('No maintenance action selected!')
+    sys.exit(1)
@@ -20,11 +20,10 @@
 import os
 import sys
 
-import tomlkit
-
 thisfile = __file__
 if not os.path.isabs(thisfile):
     thisfile = os.path.normpath(os.path.join(os.getcwd(), thisfile))
+_DEFAULT_DSRUN_PATH = os.path.normpath(os.path.join(thisfile, '..', 'dsrun'))
 
 
 __all__ = ['GlobalConfig']
@@ -36,120 +35,147 @@ class GlobalConfig:
     '''
 
     _instance = None
-
-    class __GlobalConfig:
-        def load(self, fname=None):
-            if not fname:
-                fname = '/etc/debspawn/global.toml'
-
-            cdata = {}
-            if os.path.isfile(fname):
-                with open(fname) as f:
-                    try:
-                        cdata = tomlkit.load(f)
-                    except tomlkit.exceptions.ParseError as e:
-                        print(
-                            'Unable to parse global configuration (global.toml): {}'.format(str(e)),
-                            file=sys.stderr,
-                        )
-                        sys.exit(8)
-
-            self._dsrun_path = os.path.normpath(os.path.join(thisfile, '..', 'dsrun'))
-            if not os.path.isfile(self._dsrun_path):
+    _fname = None
+
+    def __new__(cls, fname=None):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance.load(fname)
+        return cls._instance
+
+    @classmethod
+    def reset(cls):
+        '''Drop the configuration singleton, so the next use loads it again.'''
+        cls._instance = None
+
+    def load(self, fname=None):
+        if not fname:
+            fname = '/etc/debspawn/global.toml'
+        fname = os.path.realpath(fname)
+        if fname == self._fname:
+            # this configuration file was already loaded
+            return
+        self._fname = fname
+
+        try:
+            with open(fname, 'rb') as f:
+                cfg_data = f.read()
+        except (FileNotFoundError, IsADirectoryError):
+            cfg_data = None
+
+        cdata = {}
+        if cfg_data is not None:
+            try:
+                from tomllib import TOMLDecodeError as TOMLParseError
+                from tomllib import loads as toml_loads
+            except ImportError:
+                # Python < 3.11 has no TOML parser in its standard library
+                from tomlkit import loads as toml_loads
+                from tomlkit.exceptions import ParseError as TOMLParseError
+
+            try:
+                cdata = toml_loads(cfg_data.decode('utf-8'))
+            except (TOMLParseError, UnicodeDecodeError) as e:
+                print(
+                    'Unable to parse global configuration (global.toml): {}'.format(str(e)),
+                    file=sys.stderr,
+                )
+                sys.exit(8)
+
+        self._dsrun_path = _DEFAULT_DSRUN_PATH
+        if not os.path.isfile(self._dsrun_path):
+            print(
+                'Debspawn is not set up properly: Unable to find file "{}". Can not continue.'.format(
+                    self._dsrun_path
+                ),
+                file=sys.stderr,
+            )
+            sys.exit(4)
+
+        self._osroots_dir = cdata.get('OSImagesDir', '/var/lib/debspawn/images/')
+        self._results_dir = cdata.get('ResultsDir', '/var/lib/debspawn/results/')
+        self._aptcache_dir = cdata.get('APTCacheDir', '/var/lib/debspawn/aptcache/')
+        self._injected_pkgs_dir = cdata.get('InjectedPkgsDir', '/var/lib/debspawn/injected-pkgs/')
+        self._temp_dir = cdata.get('TempDir', '/var/tmp/debspawn/')
+        self._default_bootstrap_variant = cdata.get('DefaultBootstrapVariant', 'buildd')
+        self._allow_unsafe_perms = cdata.get('AllowUnsafePermissions', False)
+        self._cache_packages = bool(cdata.get('CachePackages', True))
+        self._bootstrap_tool = cdata.get('BootstrapTool', 'debootstrap')
+        self._suppress_sync = bool(cdata.get('SuppressSync', False))
+
+        self._syscall_filter = cdata.get('SyscallFilter', 'compat')
+        if self._syscall_filter == 'compat':
+            # permit some system calls known to be needed by packages that sbuild & Co.
+            # build without problems.
+            self._syscall_filter = ['@memlock', '@pkey', '@clock', '@cpu-emulation']
+        elif self._syscall_filter == 'nspawn-default':
+            # make no additional changes, so nspawn's built-in defaults are used
+            self._syscall_filter = []
+        else:
+            if not isinstance(self._syscall_filter, list):
                 print(
-                    'Debspawn is not set up properly: Unable to find file "{}". Can not continue.'.format(
-                        self._dsrun_path
+                    (
+                        'Configuration error (global.toml): Entry "SyscallFilter" needs to be either a '
+                        'string value ("compat" or "nspawn-default"), or a list of permissible '
+                        'system call names as listed by the syscall-filter command of systemd-analyze(1)'
                     ),
                     file=sys.stderr,
                 )
-                sys.exit(4)
-
-            self._osroots_dir = cdata.get('OSImagesDir', '/var/lib/debspawn/images/')
-            self._results_dir = cdata.get('ResultsDir', '/var/lib/debspawn/results/')
-            self._aptcache_dir = cdata.get('APTCacheDir', '/var/lib/debspawn/aptcache/')
-            self._injected_pkgs_dir = cdata.get('InjectedPkgsDir', '/var/lib/debspawn/injected-pkgs/')
-            self._temp_dir = cdata.get('TempDir', '/var/tmp/debspawn/')
-            self._default_bootstrap_variant = cdata.get('DefaultBootstrapVariant', 'buildd')
-            self._allow_unsafe_perms = cdata.get('AllowUnsafePermissions', False)
-            self._cache_packages = bool(cdata.get('CachePackages', True))
-            self._bootstrap_tool = cdata.get('BootstrapTool', 'debootstrap')
-
-            self._syscall_filter = cdata.get('SyscallFilter', 'compat')
-            if self._syscall_filter == 'compat':
-                # permit some system calls known to be needed by packages that sbuild & Co.
-                # build without problems.
-                self._syscall_filter = ['@memlock', '@pkey', '@clock', '@cpu-emulation']
-            elif self._syscall_filter == 'nspawn-default':
-                # make no additional changes, so nspawn's built-in defaults are used
-                self._syscall_filter = []
-            else:
-                if type(self._syscall_filter) is not list:
-                    print(
-                        (
-                            'Configuration error (global.toml): Entry "SyscallFilter" needs to be either a '
-                            'string value ("compat" or "nspawn-default"), or a list of permissible '
-                            'system call names as listed by the syscall-filter command of systemd-analyze(1)'
-                        ),
-                        file=sys.stderr,
-                    )
-                    sys.exit(8)
-
-        @property
-        def dsrun_path(self) -> str:
-            return self._dsrun_path
-
-        @dsrun_path.setter
-        def dsrun_path(self, v):
-            self._dsrun_path = v
-
-        @property
-        def osroots_dir(self) -> str:
-            return self._osroots_dir
-
-        @property
-        def results_dir(self) -> str:
-            return self._results_dir
-
-        @property
-        def aptcache_dir(self) -> str:
-            return self._aptcache_dir
-
-        @property
-        def injected_pkgs_dir(self) -> str:
-            return self._injected_pkgs_dir
-
-        @property
-        def temp_dir(self) -> str:
-            return self._temp_dir
-
-        @property
-        def default_bootstrap_variant(self) -> str:
-            return self._default_bootstrap_variant
-
-        @property
-        def syscall_filter(self) -> list:
-            """Customize which syscalls should be filtered."""
-            return self._syscall_filter
-
-        @property
-        def allow_unsafe_perms(self) -> bool:
-            """Whether usage of unsafe permissions is allowed."""
-            return self._allow_unsafe_perms
-
-        @property
-        def cache_packages(self) -> bool:
-            """Whether APT packages should be cached by debspawn."""
-            return self._cache_packages
-
-        @property
-        def bootstrap_tool(self) -> str:
-            """The chroot bootstrap tool that we should use."""
-            return self._bootstrap_tool
-
-    def __init__(self, fname=None):
-        if not GlobalConfig._instance:
-            GlobalConfig._instance = GlobalConfig.__GlobalConfig()
-            GlobalConfig._instance.load(fname)
-
-    def __getattr__(self, name):
-        return getattr(self._instance, name)
+                sys.exit(8)
+
+    @property
+    def dsrun_path(self) -> str:
+        return self._dsrun_path
+
+    @dsrun_path.setter
+    def dsrun_path(self, v):
+        self._dsrun_path = v
+
+    @property
+    def osroots_dir(self) -> str:
+        return self._osroots_dir
+
+    @property
+    def results_dir(self) -> str:
+        return self._results_dir
+
+    @property
+    def aptcache_dir(self) -> str:
+        return self._aptcache_dir
+
+    @property
+    def injected_pkgs_dir(self) -> str:
+        return self._injected_pkgs_dir
+
+    @property
+    def temp_dir(self) -> str:
+        return self._temp_dir
+
+    @property
+    def default_bootstrap_variant(self) -> str:
+        return self._default_bootstrap_variant
+
+    @property
+    def syscall_filter(self) -> list:
+        """Customize which syscalls should be filtered."""
+        return self._syscall_filter
+
+    @property
+    def allow_unsafe_perms(self) -> bool:
+        """Whether usage of unsafe permissions is allowed."""
+        return self._allow_unsafe_perms
+
+    @property
+    def cache_packages(self) -> bool:
+        """Whether APT packages should be cached by debspawn."""
+        return self._cache_packages
+
+    @property
+    def bootstrap_tool(self) -> str:
+        """The chroot bootstrap tool that we should use."""
+        return self._bootstrap_tool
+
+    @property
+    def suppress_sync(self) -> bool:
+        """Whether sync requests should be ignored inside of containers."""
+        return self._suppress_sync
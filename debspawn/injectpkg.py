@@ -18,13 +18,26 @@
 # along with this software.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
-from glob import glob
 from pathlib import Path
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
 from .utils import temp_dir, print_info, hardlink_or_copy
 
 
+def _iter_debs(pkgs_dir):
+    '''Yield the directory entries of all Debian packages in :pkgs_dir'''
+
+    try:
+        it = os.scandir(pkgs_dir)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    with it:
+        for entry in it:
+            if entry.name.endswith('.deb') and not entry.name.startswith('.') and entry.is_file():
+                yield entry
+
+
 class PackageInjector:
     '''
     Inject packages from external sources into the container APT environment.
@@ -39,24 +52,36 @@ class PackageInjector:
     def has_injectables(self):
         '''Return True if we actually have any packages ready to inject'''
 
-        if type(self._has_injectables) is bool:
+        if self._has_injectables is not None:
             return self._has_injectables
 
-        if os.path.exists(self._pkgs_basedir) and os.path.isdir(self._pkgs_basedir):
-            for f in os.listdir(self._pkgs_basedir):
-                if os.path.isfile(os.path.join(self._pkgs_basedir, f)):
-                    self._has_injectables = True
-                    return True
-
-            if os.path.exists(self._pkgs_specific_dir) and os.path.isdir(self._pkgs_specific_dir):
-                for f in os.listdir(self._pkgs_specific_dir):
-                    if os.path.isfile(os.path.join(self._pkgs_specific_dir, f)):
+        for pkgs_dir in (self._pkgs_basedir, self._pkgs_specific_dir):
+            try:
+                it = os.scandir(pkgs_dir)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+            with it:
+                for entry in it:
+                    if entry.is_file():
                         self._has_injectables = True
                         return True
 
         self._has_injectables = False
         return False
 
+    def _iter_sources(self):
+        '''
+        Yield path and file name of all packages to inject, with packages specific
+        to this environment taking precedence over the ones used by all environments.
+        '''
+
+        seen_names = set()
+        for pkgs_dir in (self._pkgs_specific_dir, self._pkgs_basedir):
+            for entry in _iter_debs(pkgs_dir):
+                if entry.name not in seen_names:
+                    seen_names.add(entry.name)
+                    yield entry.path, entry.name
+
     def create_instance_repo(self, tmp_repo_dir):
         '''
         Create a temporary location where all injected packages for this container
@@ -69,20 +94,20 @@ class PackageInjector:
         print_info('Copying injected packages to instance location')
         self._instance_repo_dir = tmp_repo_dir
 
-        # copy/link injected packages specific to this environment
-        if os.path.isdir(self._pkgs_specific_dir):
-            for pkg_fname in glob(os.path.join(self._pkgs_specific_dir, '*.deb')):
-                pkg_path = os.path.join(tmp_repo_dir, os.path.basename(pkg_fname))
-
-                if not os.path.isfile(pkg_path):
-                    hardlink_or_copy(pkg_fname, pkg_path)
-
-        # copy/link injected packages used by all environments
-        for pkg_fname in glob(os.path.join(self._pkgs_basedir, '*.deb')):
-            pkg_path = os.path.join(tmp_repo_dir, os.path.basename(pkg_fname))
-
-            if not os.path.isfile(pkg_path):
-                hardlink_or_copy(pkg_fname, pkg_path)
+        # collect injected packages that are not in the instance repo yet
+        with os.scandir(tmp_repo_dir) as it:
+            existing_names = {e.name for e in it}
+        src_fnames = []
+        dst_fnames = []
+        for pkg_fname, pkg_name in self._iter_sources():
+            if pkg_name not in existing_names:
+                src_fnames.append(pkg_fname)
+                dst_fnames.append(os.path.join(tmp_repo_dir, pkg_name))
+
+        # copy/link the packages in parallel, in case we need to fall back to copying
+        with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 4)) as executor:
+            for _ in executor.map(hardlink_or_copy, src_fnames, dst_fnames):
+                pass
 
     @property
     def instance_repo_dir(self) -> str:
@@ -97,11 +122,9 @@ def package_injector(osbase, machine_name=None):
     '''
 
     if not machine_name:
-        from random import choice
-        from string import digits, ascii_lowercase
+        from secrets import token_hex
 
-        nid = ''.join(choice(ascii_lowercase + digits) for _ in range(4))
-        machine_name = '{}-{}'.format(osbase.name, nid)
+        machine_name = '{}-{}'.format(osbase.name, token_hex(2))
 
     pi = PackageInjector(osbase)
     if not pi.has_injectables():
@@ -21,10 +21,10 @@ import os
 import sys
 import json
 import shutil
-from glob import glob
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 from .config import GlobalConfig
-from .osbase import OSBase
 from .utils.env import ensure_root
 from .utils.log import (
     print_info,
@@ -43,6 +43,60 @@ def ensure_rmtree_symattack_protection():
         sys.exit(1)
 
 
+def _remove_path(path):
+    '''Remove the file or directory tree at :path, without following symlinks'''
+
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def _fast_rm(paths):
+    '''
+    Remove all files and directory trees in :paths.
+    We prefer a single rm(1) call here, as it is a lot faster than shutil.rmtree on large
+    trees like debootstrapped images, and only fall back to removing the paths in parallel
+    with shutil.rmtree if rm is not available.
+    Exits the program with an error if rm failed, e.g. because it refused to cross into
+    a mounted filesystem.
+    '''
+
+    if not paths:
+        return
+    try:
+        proc = subprocess.run(
+            ['rm', '-rf', '--one-file-system', '--', *paths], check=False, stderr=subprocess.PIPE, text=True
+        )
+    except FileNotFoundError:
+        proc = None
+    if proc is not None:
+        if proc.returncode != 0:
+            print_error('Unable to remove data: {}'.format(proc.stderr.strip()))
+            sys.exit(1)
+        return
+
+    # paths may overlap, but the trees we remove in parallel must be disjoint,
+    # so we drop duplicates and paths below other paths that are removed anyway
+    top_paths: list[str] = []
+    for path in sorted({os.path.normpath(os.path.abspath(p)) for p in paths}, key=len):
+        if any(path.startswith(top.rstrip(os.sep) + os.sep) for top in top_paths):
+            continue
+        top_paths.append(path)
+
+    # deletion is I/O bound, so we can remove multiple trees at once
+    with ThreadPoolExecutor(max_workers=min(16, (os.cpu_count() or 4) * 2)) as executor:
+        for _ in executor.map(_remove_path, top_paths):
+            pass
+
+
+def _visible_dir_entries(dirname):
+    '''Return all entries of :dirname, except for hidden ones'''
+
+    with os.scandir(dirname) as it:
+        return [e for e in it if not e.name.startswith('.')]
+
+
 def maintain_migrate(gconf: GlobalConfig):
     '''Migrate configuration from older versions of debspawn to the latest version'''
 
@@ -65,17 +119,20 @@ def maintain_clear_caches(gconf: GlobalConfig):
 
     aptcache_dir = gconf.aptcache_dir
     if os.path.isdir(aptcache_dir):
-        for cdir in glob(os.path.join(aptcache_dir, '*')):
-            print_info('Removing APT cache for: {}'.format(os.path.basename(cdir)))
-            if os.path.isdir(cdir):
-                shutil.rmtree(cdir)
+        cache_dirs = []
+        for entry in _visible_dir_entries(aptcache_dir):
+            print_info('Removing APT cache for: {}'.format(entry.name))
+            # the entry type is usually known from reading the directory, so this needs no stat
+            if entry.is_dir(follow_symlinks=False):
+                cache_dirs.append(entry.path)
             else:
-                os.remove(cdir)
+                os.unlink(entry.path)
+        _fast_rm(cache_dirs)
 
     dcache_dir = os.path.join(gconf.osroots_dir, 'dcache')
     if os.path.isdir(dcache_dir):
         print_info('Removing image derivatives cache.')
-        shutil.rmtree(dcache_dir)
+        _fast_rm([dcache_dir])
 
 
 def maintain_purge(gconf: GlobalConfig, force: bool = False):
@@ -113,42 +170,64 @@ def maintain_purge(gconf: GlobalConfig, force: bool = False):
             return
 
     print_warn('Deleting all images, image configuration, build results and state data.')
+    purge_paths: list[str] = []
     for sdir in [gconf.osroots_dir, gconf.results_dir, gconf.aptcache_dir, gconf.injected_pkgs_dir]:
         if not os.path.isdir(sdir):
             continue
         if sdir.startswith('/home/') or sdir.startswith('/usr/'):
             continue
         print_info('Purging: {}'.format(sdir))
-        for d in glob(os.path.join(sdir, '*')):
-            if os.path.isdir(d):
-                shutil.rmtree(d)
-            else:
-                os.remove(d)
+        purge_paths.extend(e.path for e in _visible_dir_entries(sdir))
+    _fast_rm(purge_paths)
 
     default_state_dir = '/var/lib/debspawn/'
     if os.path.isdir(default_state_dir):
         print_info('Removing: {}'.format(default_state_dir))
-        shutil.rmtree(default_state_dir)
+        _fast_rm([default_state_dir])
+
+
+def _iter_image_tarballs(osroots_dir):
+    '''Yield the paths of all container image tarballs in :osroots_dir'''
 
+    try:
+        it = os.scandir(osroots_dir)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    with it:
+        for entry in it:
+            if entry.name.endswith('.tar.zst') and not entry.name.startswith('.'):
+                yield entry.path
+
+
+def _update_image(
+    gconf: GlobalConfig, imgid: str, img_basepath: str, cdata: dict, *, interactive: bool = True
+) -> bool:
+    '''Update a single container image, returning True on success.'''
+    from .osbase import OSBase
+
+    print_bullet('Update: {}'.format(imgid), indent=1, large=True)
+    osbase = OSBase(
+        gconf,
+        cdata['Suite'],
+        cdata['Architecture'],
+        cdata.get('Variant'),
+        custom_name=os.path.basename(img_basepath),
+    )
+    r = osbase.update(interactive=interactive)
+    if not r:
+        print_error('Failed to update {}'.format(imgid))
+    return r
 
-def maintain_update_all(gconf: GlobalConfig):
+
+def maintain_update_all(gconf: GlobalConfig, jobs: int = 1):
     '''Update all container images that we know.'''
 
     ensure_root()
 
-    osroots_dir = gconf.osroots_dir
-    tar_files = []
-    if os.path.isdir(osroots_dir):
-        tar_files = list(glob(os.path.join(osroots_dir, '*.tar.zst')))
-    if not tar_files:
-        print_info('No container base images have been found!')
-        return
-
-    failed_images = []
+    images = []
     nodata_images = []
-    first_entry = True
-    for tar_fname in tar_files:
-        img_basepath = os.path.splitext(os.path.splitext(tar_fname)[0])[0]
+    for tar_fname in _iter_image_tarballs(gconf.osroots_dir):
+        img_basepath = tar_fname[: -len('.tar.zst')]
         config_fname = img_basepath + '.json'
         imgid = os.path.basename(img_basepath)
 
@@ -158,24 +237,28 @@ def maintain_update_all(gconf: GlobalConfig):
             continue
 
         with open(config_fname, 'rt') as f:
-            cdata = json.loads(f.read())
-
-        if not first_entry:
-            print()
-        first_entry = False
-        print_bullet('Update: {}'.format(imgid), indent=1, large=True)
-
-        osbase = OSBase(
-            gconf,
-            cdata['Suite'],
-            cdata['Architecture'],
-            cdata.get('Variant'),
-            custom_name=os.path.basename(img_basepath),
-        )
-        r = osbase.update()
-        if not r:
-            print_error('Failed to update {}'.format(imgid))
-            failed_images.append(imgid)
+            cdata = json.load(f)
+        images.append((imgid, img_basepath, cdata))
+    if not images and not nodata_images:
+        print_info('No container base images have been found!')
+        return
+
+    failed_images = []
+    if jobs > 1 and len(images) > 1:
+        # image updates mostly wait for the network and for the container, so we can run
+        # several of them at once - at the expense of their output being interleaved.
+        # The containers must not compete for our terminal, so none of them gets access to it.
+        with ThreadPoolExecutor(max_workers=min(jobs, len(images))) as executor:
+            results = executor.map(lambda img: _update_image(gconf, *img, interactive=False), images)
+            for img, r in zip(images, results):
+                if not r:
+                    failed_images.append(img[0])
+    else:
+        for i, img in enumerate(images):
+            if i > 0:
+                print()
+            if not _update_image(gconf, *img):
+                failed_images.append(img[0])
 
     if nodata_images or failed_images:
         print()
@@ -192,6 +275,8 @@ def maintain_print_status(gconf: GlobalConfig):
     that may be useful for debugging issues.
     '''
     import platform
+    import textwrap
+    from glob import glob
 
     from . import __version__
     from .nspawn import systemd_version, systemd_detect_virt
@@ -201,18 +286,26 @@ def maintain_print_status(gconf: GlobalConfig):
     sys.stdout.flush()
 
     # read distribution information
-    os_release = {}
-    if os.path.exists('/etc/os-release'):
-        with open('/etc/os-release') as f:
-            for line in f:
-                k, v = line.rstrip().split("=")
-                os_release[k] = v.strip('"')
+    try:
+        os_release = platform.freedesktop_os_release()
+    except OSError:
+        os_release = {}
+    except AttributeError:
+        # Python < 3.10 has no os-release parser
+        os_release = {}
+        if os.path.exists('/etc/os-release'):
+            with open('/etc/os-release') as f:
+                for line in f:
+                    k, sep, v = line.rstrip().partition('=')
+                    if sep and not k.startswith('#'):
+                        os_release[k] = v.strip('"\'')
 
     print_section('Host System')
     print('OS:', os_release.get('NAME', 'Unknown'), os_release.get('VERSION', '<?>'))
     print('Platform:', platform.platform(aliased=True))
     print('Virtualization:', systemd_detect_virt())
-    print('Systemd-nspawn version:', systemd_version())
+    sd_version = systemd_version()
+    print('Systemd-nspawn version:', sd_version if sd_version is not None else 'Unknown')
     print('Bootstrap tool:', '{} {}'.format(gconf.bootstrap_tool, bootstrap_tool_version(gconf)))
 
     print_section('Container image list')
@@ -243,5 +336,4 @@ def maintain_print_status(gconf: GlobalConfig):
     else:
         print('Global configuration:')
         with open('/etc/debspawn/global.toml', 'r') as f:
-            for line in f:
-                print('    ', line)
+            print(textwrap.indent(f.read().rstrip('\n'), '    '))
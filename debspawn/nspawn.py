@@ -18,9 +18,11 @@
 # along with this software.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import shlex
 import typing as T
 import platform
 import subprocess
+from functools import lru_cache
 
 from .utils import (
     safe_run,
@@ -34,26 +36,28 @@ from .injectpkg import PackageInjector
 from .utils.env import unicode_allowed, colored_output_allowed
 from .utils.command import run_command
 
-__systemd_version = None
+# the host machine hardware name never changes while we are running
+_HOST_MACHINE = platform.machine()
 
+# architecture names that can run with the x86 personality on x86_64 hosts
+_I386_ARCHS = frozenset(('i386', 'i486', 'i586', 'i686'))
 
-def systemd_version():
-    global __systemd_version
-    if __systemd_version:
-        return __systemd_version
 
-    __systemd_version = -1
+@lru_cache(maxsize=1)
+def systemd_version() -> T.Optional[int]:
+    version = None
     try:
         out, _, _ = safe_run(['systemd-nspawn', '--version'])
         parts = out.split(' ', 2)
         if len(parts) >= 2:
-            __systemd_version = int(parts[1])
+            version = int(parts[1])
     except Exception as e:
         print_warn('Unable to determine systemd version: {}'.format(e))
 
-    return __systemd_version
+    return version
 
 
+@lru_cache(maxsize=1)
 def systemd_detect_virt():
     vm_name = 'unknown'
     try:
@@ -65,11 +69,12 @@ def systemd_detect_virt():
     return vm_name
 
 
+@lru_cache(maxsize=None)
 def systemd_version_atleast(expected_version: int):
     v = systemd_version()
     # we always assume we are running the highest version,
     # if we failed to determine the right systemd version
-    if v < 0:
+    if v is None:
         return True
     if v >= expected_version:
         return True
@@ -82,13 +87,54 @@ def get_nspawn_personality(osbase):
     of host architecture and base OS.
     This allows running x86 builds on amd64 machines.
     '''
-    import fnmatch
-
-    if platform.machine() == 'x86_64' and fnmatch.filter([osbase.arch], 'i?86'):
+    if _HOST_MACHINE == 'x86_64' and osbase.arch in _I386_ARCHS:
         return 'x86'
     return None
 
 
+class _AllowedPermissions(T.NamedTuple):
+    capabilities: tuple[str, ...]
+    full_dev: bool
+    full_proc: bool
+    ro_kmods: bool
+    kvm: bool
+    all_privileges: bool
+    unknown: tuple[str, ...]
+
+
+@lru_cache(maxsize=16)
+def _parse_allow_permissions(allow_permissions: tuple[str, ...]) -> _AllowedPermissions:
+    '''
+    Sort the permissions a container was allowed into capabilities and special access flags.
+    '''
+
+    capabilities = []
+    unknown = []
+    flags = dict.fromkeys(('full-dev', 'full-proc', 'read-kmods', 'kvm'), False)
+    all_privileges = False
+    for perm in allow_permissions:
+        perm = perm.lower()
+        if perm == 'all':
+            capabilities.append(perm)
+            all_privileges = True
+        elif perm.startswith('cap_'):
+            capabilities.append(perm.upper())
+        elif perm in flags:
+            flags[perm] = True
+        else:
+            unknown.append(perm)
+
+    return _AllowedPermissions(
+        capabilities=tuple(capabilities),
+        full_dev=flags['full-dev'],
+        full_proc=flags['full-proc'],
+        ro_kmods=flags['read-kmods'],
+        kvm=flags['kvm'],
+        all_privileges=all_privileges,
+        unknown=tuple(unknown),
+    )
+
+
 def _execute_sdnspawn(
     osbase,
     parameters,
@@ -100,10 +146,12 @@ def _execute_sdnspawn(
     env_vars: dict[str, str] = None,
     private_users: bool = False,
     nowait: bool = False,
+    interactive: bool = True,
 ) -> T.Union[subprocess.CompletedProcess, subprocess.Popen]:
     '''
     Execute systemd-nspawn with the given parameters.
     Mess around with cgroups if necessary.
+    If :interactive is False, the container does not get access to our terminal.
     '''
     import sys
 
@@ -114,31 +162,17 @@ def _execute_sdnspawn(
     if not env_vars:
         env_vars = {}
 
-    capabilities = []
-    full_dev_access = False
-    full_proc_access = False
-    ro_kmods_access = False
-    kvm_access = False
-    all_privileges = False
-    for perm in allow_permissions:
-        perm = perm.lower()
-        if perm.startswith('cap_') or perm == 'all':
-            if perm == 'all':
-                capabilities.append(perm)
-                print_warn('Container retains all privileges.')
-                all_privileges = True
-            else:
-                capabilities.append(perm.upper())
-        elif perm == 'full-dev':
-            full_dev_access = True
-        elif perm == 'full-proc':
-            full_proc_access = True
-        elif perm == 'read-kmods':
-            ro_kmods_access = True
-        elif perm == 'kvm':
-            kvm_access = True
-        else:
-            print_info('Unknown allowed permission: {}'.format(perm))
+    perms = _parse_allow_permissions(tuple(allow_permissions))
+    capabilities = perms.capabilities
+    full_dev_access = perms.full_dev
+    full_proc_access = perms.full_proc
+    ro_kmods_access = perms.ro_kmods
+    kvm_access = perms.kvm
+    all_privileges = perms.all_privileges
+    if all_privileges:
+        print_warn('Container retains all privileges.')
+    for perm in perms.unknown:
+        print_info('Unknown allowed permission: {}'.format(perm))
 
     if (
         capabilities or full_dev_access or full_proc_access or kvm_access
@@ -148,31 +182,28 @@ def _execute_sdnspawn(
         )
         sys.exit(9)
 
-    cmd = ['systemd-nspawn']
-    cmd.extend(['-M', machine_name])
-    if boot:
-        # if we boot the container, we also register it with machinectl, otherwise
-        # we run an unregistered container with the command as PID2
-        cmd.append('-b')
-        cmd.append('--notify-ready=yes')
-    else:
-        cmd.append('--register=no')
-        cmd.append('-a')
+    # if we boot the container, we also register it with machinectl, otherwise
+    # we run an unregistered container with the command as PID2
+    cmd = ['systemd-nspawn', '-M', machine_name]
+    cmd.extend(['-b', '--notify-ready=yes'] if boot else ['--register=no', '-a'])
     if private_users:
         cmd.append('-U')  # User namespaces with --private-users=pick --private-users-chown, if possible
 
     # never try to bindmount /etc/localtime
     cmd.append('--timezone=copy')
+    # container instances are disposable, so we can skip flushing their data to disk if allowed
+    if osbase.global_config.suppress_sync and systemd_version_atleast(250):
+        cmd.append('--suppress-sync=yes')
 
+    # never let the container take over our terminal if it is not supposed to be interactive
+    if (full_dev_access or not interactive) and systemd_version_atleast(244):
+        cmd.append('--console=pipe')
     if full_dev_access:
         cmd.extend(['--bind', '/dev'])
-        if systemd_version_atleast(244):
-            cmd.append('--console=pipe')
         cmd.extend(['--property=DeviceAllow=block-* rw', '--property=DeviceAllow=char-* rw'])
     if kvm_access and not full_dev_access:
         if os.path.exists('/dev/kvm'):
-            cmd.extend(['--bind', '/dev/kvm'])
-            cmd.extend(['--property=DeviceAllow=/dev/kvm rw'])
+            cmd.extend(['--bind', '/dev/kvm', '--property=DeviceAllow=/dev/kvm rw'])
         else:
             print_warn(
                 'Access to KVM requested, but /dev/kvm does not exist on the host. Is virtualization supported?'
@@ -182,8 +213,7 @@ def _execute_sdnspawn(
         if not all_privileges:
             print_warn('Container has access to host /proc')
     if ro_kmods_access:
-        cmd.extend(['--bind-ro', '/lib/modules/'])
-        cmd.extend(['--bind-ro', '/boot/'])
+        cmd.extend(['--bind-ro', '/lib/modules/', '--bind-ro', '/boot/'])
     if capabilities:
         cmd.extend(['--capability', ','.join(capabilities)])
     if syscall_filter:
@@ -198,7 +228,35 @@ def _execute_sdnspawn(
     if nowait:
         return subprocess.Popen(cmd, shell=False, stdin=subprocess.DEVNULL)
     else:
-        return run_forwarded(cmd)
+        return run_forwarded(cmd, stdin=None if interactive else subprocess.DEVNULL)
+
+
+def _make_nspawn_params(
+    osbase,
+    base_dir: str,
+    chdir: str,
+    flags: T.Sequence[str],
+    command: T.Sequence[str],
+    *,
+    mode_switches: str,
+    binds: list[str] = None,
+) -> list[str]:
+    '''
+    Create the systemd-nspawn parameters shared by persistent and ephemeral runs.
+    :mode_switches is the short option group ending with -D that selects how the
+    container image in :base_dir is used.
+    '''
+
+    params = ['--chdir={}'.format(chdir), '--link-journal=no']
+    if binds:
+        params.extend(binds)
+
+    personality = get_nspawn_personality(osbase)
+    if personality:
+        params.append('--personality={}'.format(personality))
+    params.extend([*flags, mode_switches, base_dir, *command])
+
+    return params
 
 
 def nspawn_run_persist(
@@ -206,8 +264,8 @@ def nspawn_run_persist(
     base_dir,
     machine_name,
     chdir,
-    command: T.Union[list[str], str] = None,
-    flags: T.Union[list[str], str] = None,
+    command: T.Union[T.Sequence[str], str] = (),
+    flags: T.Union[T.Sequence[str], str] = (),
     *,
     tmp_apt_cache_dir: str = None,
     pkginjector: PackageInjector = None,
@@ -217,36 +275,32 @@ def nspawn_run_persist(
     private_users: bool = False,
     boot: bool = False,
     verbose: bool = False,
+    use_apt_cache: bool = True,
+    interactive: bool = True,
 ):
+    # a command or flags given as string would otherwise be unpacked into single characters
     if isinstance(command, str):
-        command = command.split(' ')
-    elif not command:
-        command = []
+        command = shlex.split(command)
     if isinstance(flags, str):
-        flags = flags.split(' ')
-    elif not flags:
-        flags = []
-
-    personality = get_nspawn_personality(osbase)
+        flags = shlex.split(flags)
 
     def run_nspawn_with_aptcache(aptcache_tmp_dir):
-        params = [
-            '--chdir={}'.format(chdir),
-            '--link-journal=no',
-        ]
+        binds = []
         if aptcache_tmp_dir:
-            params.append('--bind={}:/var/cache/apt/archives/'.format(aptcache_tmp_dir))
+            binds.append('--bind={}:/var/cache/apt/archives/'.format(aptcache_tmp_dir))
         if pkginjector and pkginjector.instance_repo_dir:
-            params.append('--bind={}:/srv/extra-packages/'.format(pkginjector.instance_repo_dir))
-
-        if personality:
-            params.append('--personality={}'.format(personality))
-        params.extend(flags)
-        params.extend(['-{}D'.format('' if verbose else 'q'), base_dir])
+            binds.append('--bind={}:/srv/extra-packages/'.format(pkginjector.instance_repo_dir))
 
         # nspawn can not run a command in a booted container on its own
-        if not boot:
-            params.extend(command)
+        params = _make_nspawn_params(
+            osbase,
+            base_dir,
+            chdir,
+            flags,
+            command if not boot else [],
+            mode_switches='-{}D'.format('' if verbose else 'q'),
+            binds=binds,
+        )
         sdns_nowait = boot and command
 
         # ensure the temporary apt cache is up-to-date
@@ -264,6 +318,7 @@ def nspawn_run_persist(
             private_users=private_users,
             boot=boot,
             nowait=sdns_nowait,
+            interactive=interactive,
         )
 
         if not sdns_nowait:
@@ -275,6 +330,8 @@ def nspawn_run_persist(
                 # the container is (hopefully) running now, but let's check for that
                 time_ac_start = time.time()
                 container_booted = False
+                # check often at first, as containers usually boot quickly
+                poll_delay = 0.025
                 while (time.time() - time_ac_start) < 60:
                     scisr_out, _, _ = run_command(
                         [
@@ -293,7 +350,8 @@ def nspawn_run_persist(
                         print()
                         container_booted = True
                         break
-                    time.sleep(0.5)
+                    time.sleep(poll_delay)
+                    poll_delay = min(poll_delay * 2, 0.5)
 
                 if container_booted:
                     sdr_cmd = [
@@ -304,14 +362,18 @@ def nspawn_run_persist(
                         machine_name,
                         '--working-directory',
                         chdir,
-                    ] + command
+                        *command,
+                    ]
                     proc = run_forwarded(sdr_cmd)
                     ret = proc.returncode
                 else:
                     ret = 7
                     print_error('Timed out while waiting for the container to boot.')
             finally:
-                run_forwarded(['machinectl', 'poweroff', machine_name])
+                # our command has completed, so there is no need to wait for an orderly shutdown
+                _, _, tret = run_command(['machinectl', 'terminate', machine_name])
+                if tret != 0:
+                    run_forwarded(['machinectl', 'poweroff', machine_name])
                 try:
                     ns_proc.wait(30)
                 except subprocess.TimeoutExpired:
@@ -323,8 +385,9 @@ def nspawn_run_persist(
 
         return ret
 
-    if not osbase.cache_packages:
-        # APT package caching was explicitly disabled by the user
+    if not osbase.cache_packages or not use_apt_cache:
+        # APT package caching was explicitly disabled by the user, or the command
+        # is known to not touch APT at all
         ret = run_nspawn_with_aptcache(None)
     elif tmp_apt_cache_dir:
         # we will be reusing an externally provided temporary APT cache directory
@@ -342,31 +405,21 @@ def nspawn_run_ephemeral(
     base_dir,
     machine_name,
     chdir,
-    command: T.Union[list[str], str] = None,
-    flags: T.Union[list[str], str] = None,
+    command: T.Union[T.Sequence[str], str] = (),
+    flags: T.Union[T.Sequence[str], str] = (),
     allowed: list[str] = None,
     syscall_filter: list[str] = None,
     env_vars: dict[str, str] = None,
     private_users: bool = False,
     boot: bool = False,
 ):
+    # a command or flags given as string would otherwise be unpacked into single characters
     if isinstance(command, str):
-        command = command.split(' ')
-    elif not command:
-        command = []
+        command = shlex.split(command)
     if isinstance(flags, str):
-        flags = flags.split(' ')
-    elif not flags:
-        flags = []
+        flags = shlex.split(flags)
 
-    personality = get_nspawn_personality(osbase)
-
-    params = ['--chdir={}'.format(chdir), '--link-journal=no']
-    if personality:
-        params.append('--personality={}'.format(personality))
-    params.extend(flags)
-    params.extend(['-qxD', base_dir])
-    params.extend(command)
+    params = _make_nspawn_params(osbase, base_dir, chdir, flags, command, mode_switches='-qxD')
 
     return _execute_sdnspawn(
         osbase,
@@ -381,7 +434,7 @@ def nspawn_run_ephemeral(
 
 def nspawn_make_helper_cmd(flags, build_uid: int):
     if isinstance(flags, str):
-        flags = flags.split(' ')
+        flags = shlex.split(flags)
 
     cmd = ['/usr/lib/debspawn/dsrun']
     if not colored_output_allowed():
@@ -403,7 +456,7 @@ def nspawn_run_helper_ephemeral(
     chdir='/tmp',
     *,
     build_uid: int,
-    nspawn_flags: T.Union[list[str], str] = None,
+    nspawn_flags: T.Union[T.Sequence[str], str] = (),
     allowed: list[str] = None,
     env_vars: dict[str, str] = None,
     private_users: bool = False,
@@ -429,13 +482,15 @@ def nspawn_run_helper_persist(
     chdir='/tmp',
     *,
     build_uid: int,
-    nspawn_flags: T.Union[list[str], str] = None,
+    nspawn_flags: T.Union[T.Sequence[str], str] = (),
     tmp_apt_cache_dir=None,
     pkginjector=None,
     allowed: list[str] = None,
     syscall_filter: list[str] = None,
     env_vars: dict[str, str] = None,
     private_users: bool = False,
+    use_apt_cache: bool = True,
+    interactive: bool = True,
 ):
     cmd = nspawn_make_helper_cmd(helper_flags, build_uid)
     return nspawn_run_persist(
@@ -451,4 +506,6 @@ def nspawn_run_helper_persist(
         syscall_filter=syscall_filter,
         env_vars=env_vars,
         private_users=private_users,
+        use_apt_cache=use_apt_cache,
+        interactive=interactive,
     )
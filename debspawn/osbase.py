@@ -19,10 +19,14 @@
 
 import os
 import json
+import stat
 import shutil
 import typing as T
+import platform
 import subprocess
 from pathlib import Path
+from secrets import token_hex
+from functools import lru_cache
 from contextlib import contextmanager
 
 from .utils import (
@@ -43,13 +47,21 @@ from .utils.misc import safe_copy, maybe_remove, rmtree_mntsafe
 from .utils.command import safe_run
 from .utils.zstd_tar import ensure_tar_zstd, compress_directory, decompress_tarball
 
+# the host name used as prefix for our container machine names
+_HOST_NAME = platform.node()
+
 
 def bootstrap_tool_version(gconf=None):
     if not gconf:
         gconf = GlobalConfig()
+    return _bootstrap_tool_version(gconf.bootstrap_tool)
+
+
+@lru_cache(maxsize=4)
+def _bootstrap_tool_version(bootstrap_tool: str):
     ds_version = 'unknown'
     try:
-        out, _, _ = safe_run([gconf.bootstrap_tool, '--version'])
+        out, _, _ = safe_run([bootstrap_tool, '--version'])
         parts = out.strip().split(' ', 2)
         ds_version = parts[0 if len(parts) < 2 else 1]
     except Exception as e:
@@ -147,7 +159,7 @@ class OSBase:
             sys.exit(3)
 
         with open(config_fname, 'rt') as f:
-            cdata = json.loads(f.read())
+            cdata = json.load(f)
 
             c_suite = cdata.get('Suite', self.suite)
             if not self._suite:
@@ -233,8 +245,21 @@ class OSBase:
         Path(script_location).mkdir(parents=True, exist_ok=True)
         script_fname = os.path.join(script_location, 'dsrun')
 
-        if os.path.isfile(script_fname):
+        # skip copying if the container already has the current helper, which copy2 preserved the mtime of.
+        # Images are stored as tarballs, which only keep the mtime with a precision of whole seconds.
+        src_st = os.stat(self._gconf.dsrun_path)
+        try:
+            dst_st = os.lstat(script_fname)
+            if (
+                dst_st.st_size == src_st.st_size
+                and int(dst_st.st_mtime) == int(src_st.st_mtime)
+                and stat.S_ISREG(dst_st.st_mode)
+                and stat.S_IMODE(dst_st.st_mode) == 0o0755
+            ):
+                return
             os.remove(script_fname)
+        except FileNotFoundError:
+            pass
         shutil.copy2(self._gconf.dsrun_path, script_fname)
 
         os.chmod(script_fname, 0o0755)
@@ -285,11 +310,7 @@ class OSBase:
         return self.exists()
 
     def new_nspawn_machine_name(self):
-        import platform
-        from random import choice
-        from string import digits, ascii_lowercase
-
-        nid = ''.join(choice(ascii_lowercase + digits) for _ in range(4))
+        nid = token_hex(2)
 
         # on Linux, the maximum hostname length is 64, so we simple set this as general default for
         # debspawn here.
@@ -297,8 +318,8 @@ class OSBase:
         # This should only ever matter if the hostname of the system already is incredibly long
         uniq_suffix = '{}-{}'.format(self.name, nid)
         if len(uniq_suffix) > 48:
-            uniq_suffix = ''.join(choice(ascii_lowercase + digits) for _ in range(12))
-        node_name_prefix = platform.node()[: 63 - len(uniq_suffix)]
+            uniq_suffix = token_hex(6)
+        node_name_prefix = _HOST_NAME[: 63 - len(uniq_suffix)]
 
         return '{}-{}'.format(node_name_prefix, uniq_suffix)
 
@@ -754,8 +775,11 @@ class OSBase:
         else:
             print_info('New compressed tarball size is {}'.format(format_filesize(tar_size)))
 
-    def update(self):
-        '''Update container base image'''
+    def update(self, interactive: bool = True):
+        '''
+        Update container base image.
+        If :interactive is False, the update runs without access to our terminal.
+        '''
         ensure_root()
 
         if not self._load_existent():
@@ -764,7 +788,7 @@ class OSBase:
 
         print_header('Updating container image')
 
-        with self.new_instance() as (instance_dir, _):
+        with self.new_instance() as (instance_dir, machine_name):
             # ensure helper script runner exists and is up to date
             self._copy_helper_script(instance_dir)
 
@@ -773,9 +797,10 @@ class OSBase:
                 nspawn_run_helper_persist(
                     self,
                     instance_dir,
-                    self.new_nspawn_machine_name(),
+                    machine_name,
                     '--update',
                     build_uid=self._builder_uid,
+                    interactive=interactive,
                 )
                 != 0
             ):
@@ -818,7 +843,7 @@ class OSBase:
 
         # read configuration data
         with open(config_fname, 'rt') as f:
-            cdata: T.Dict[str, T.Union[str, bool]] = json.loads(f.read())
+            cdata: T.Dict[str, T.Union[str, bool]] = json.load(f)
             self._name = cdata.get('Name', self.name)
             self._custom_name = cdata.get('CustomName', self._custom_name)
             self._suite = cdata.get('Suite', self.suite)
@@ -894,7 +919,7 @@ class OSBase:
             if persistent
             else 'Login for {}'.format(self.name)
         )
-        with self.new_instance() as (instance_dir, _):
+        with self.new_instance() as (instance_dir, machine_name):
             # ensure helper script runner exists and is up to date
             self._copy_helper_script(instance_dir)
 
@@ -902,7 +927,7 @@ class OSBase:
             nspawn_run_persist(
                 self,
                 instance_dir,
-                self.new_nspawn_machine_name(),
+                machine_name,
                 '/srv',
                 verbose=True,
                 allowed=allowed,
@@ -1149,9 +1174,9 @@ def print_container_base_image_info(gconf):
         # read configuration data if it exists
         if os.path.isfile(config_fname):
             with open(config_fname, 'rt') as f:
-                cdata = json.loads(f.read())
+                cdata = json.load(f)
             for key, value in cdata.items():
-                if type(value) is list:
+                if isinstance(value, list):
                     value = '; '.join(value)
                 print('{} = {}'.format(key, value))
 
@@ -77,7 +77,7 @@ def safe_run(cmd, input=None, expected=0):
     return out, err, ret
 
 
-def run_forwarded(command):
+def run_forwarded(command, stdin=None):
     '''
     Run a command, forwarding all output to the current stdout as well as to
     our build-logger in case we have one set previously.
@@ -86,7 +86,7 @@ def run_forwarded(command):
         command = shlex.split(command)
 
     if isinstance(sys.stdout, TwoStreamLogger):
-        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        proc = subprocess.Popen(command, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
         # ensure output is written to our file as well as stdout (as sys.stdout may be a redirect)
         while True:
             line = proc.stdout.readline()
@@ -95,4 +95,4 @@ def run_forwarded(command):
             sys.stdout.write(str(line, 'utf-8', 'replace'))
         return proc
     else:
-        return subprocess.run(command, check=False)
+        return subprocess.run(command, stdin=stdin, check=False)
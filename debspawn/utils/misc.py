@@ -22,13 +22,12 @@ import sys
 import stat
 import fcntl
 import shutil
+import string
 import typing as T
 import subprocess
 from pathlib import Path
 from contextlib import contextmanager
 
-from ..config import GlobalConfig
-
 
 class MountError(Exception):
     """Error while dealing with mountpoints."""
@@ -69,14 +68,23 @@ def random_string(prefix: T.Optional[str] = None, count: int = 8):
     return rdm_id
 
 
-def systemd_escape(name: str) -> T.Optional[str]:
-    '''Escape a string using systemd's escaping rules.'''
-    from .command import run_command
+# characters systemd keeps as-is when escaping unit names
+_SYSTEMD_UNESCAPED_CHARS = frozenset(string.ascii_letters + string.digits + ':_.')
+# escape sequence for every byte value, following systemd's unit name escaping rules
+_SYSTEMD_ESCAPE_TABLE = tuple(
+    '-' if b == ord('/') else chr(b) if chr(b) in _SYSTEMD_UNESCAPED_CHARS else '\\x{:02x}'.format(b)
+    for b in range(256)
+)
+
+
+def systemd_escape(name: str) -> str:
+    '''Escape a string using systemd's escaping rules, like systemd-escape(1) does.'''
 
-    out, _, ret = run_command(['systemd-escape', name])
-    if ret != 0:
-        return None
-    return out.strip()
+    escaped = ''.join([_SYSTEMD_ESCAPE_TABLE[b] for b in name.encode('utf-8')])
+    # systemd does not create unit names with a leading dot
+    if escaped.startswith('.'):
+        escaped = '\\x2e' + escaped[1:]
+    return escaped
 
 
 @contextmanager
@@ -87,6 +95,7 @@ def temp_dir(basename=None):
     bind-mounted directories upon deletion, and will unmount those directories
     instead.
     '''
+    from ..config import GlobalConfig
 
     dir_name = random_string(basename)
     temp_basedir = GlobalConfig().temp_dir
@@ -45,7 +45,8 @@ def ensure_tar_zstd():
 def compress_directory(dirname, tarname):
     '''Compress a directory to a given tarball'''
 
-    cmd = ['tar', '-C', dirname, '-I', 'zstd', '-cf', tarname, '.']
+    # compress using all CPU cores, with a larger window to catch redundancy across files
+    cmd = ['tar', '-C', dirname, '-I', 'zstd -T0 --long=27', '-cf', tarname, '.']
 
     out, err, ret = run_command(cmd)
 
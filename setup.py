@@ -92,6 +92,7 @@ cmdclass = {
 
 packages = [
     'debspawn',
+    'debspawn.cli',
     'debspawn.utils',
 ]
 
@@ -99,7 +100,7 @@ package_data = {'': ['debspawn/dsrun']}
 
 scripts = ['debspawn.py']
 
-install_requires = ['tomlkit>=0.8']
+install_requires = ['tomlkit>=0.8; python_version < "3.11"']
 
 setup(
     name=__appname__,
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2019-2022 Matthias Klumpp <matthias@tenstral.net>
+#
+# Licensed under the GNU Lesser General Public License Version 3
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License as published by
+# the Free Software Foundation, either version 3 of the license, or
+# (at your option) any later version.
+#
+# This software is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public License
+# along with this software.  If not, see <http://www.gnu.org/licenses/>.
+
+import pytest
+
+from debspawn.cli import (
+    create_parser,
+    _sniff_subcommand,
+    _environment_is_utf8,
+    _split_custom_command,
+)
+
+
+@pytest.mark.parametrize(
+    'args,expected',
+    [
+        (['create', 'sid'], 'create'),
+        # values of generic options must not be mistaken for the subcommand
+        (['-c', 'X', 'run', 'sid'], 'run'),
+        (['--config', 'build', 'b', 'sid', '.'], 'build'),
+        (['--owner', 'u:g', 'b', 'sid', '.'], 'build'),
+        (['--verbose', '--no-color', 'list'], 'list'),
+        # aliases
+        (['ls'], 'list'),
+        (['b', 'sid', '.'], 'build'),
+        # no known subcommand
+        ([], None),
+        (['--help'], None),
+        (['-c', 'X'], None),
+        (['frobnicate', 'sid'], None),
+    ],
+)
+def test_sniff_subcommand(args, expected):
+    assert _sniff_subcommand(args) == expected
+
+
+def test_split_custom_command():
+    args = ['-c', 'X', '--owner', 'u:g', 'run', '--allow', 'kvm', 'sid', '---', 'echo', '--', '-x']
+    active_sub = _sniff_subcommand(args)
+    assert active_sub == 'run'
+
+    ds_args, custom_command = _split_custom_command(args, active_sub)
+    assert ds_args == ['-c', 'X', '--owner', 'u:g', 'run', '--allow', 'kvm', 'sid']
+    assert custom_command == ['echo', '--', '-x']
+
+    # the remaining arguments must be understood by the parser
+    options = create_parser(active_sub=active_sub).parse_args(ds_args)
+    assert options.sp_name == 'run'
+    assert options.config == 'X'
+    assert options.name == 'sid'
+    assert options.allow == ['kvm']
+
+    # no separator, nothing to split off
+    args = ['run', 'sid', 'echo']
+    assert _split_custom_command(args, 'run') == (args, None)
+
+    # the separator only has a special meaning for 'run'
+    args = ['build', 'sid', '---', 'x']
+    assert _split_custom_command(args, 'build') == (args, None)
+
+    # a separator without a command after it is an error
+    with pytest.raises(SystemExit):
+        _split_custom_command(['run', 'sid', '---'], 'run')
+
+
+@pytest.mark.parametrize(
+    'env,expected',
+    [
+        ({'LANG': 'en_US.UTF-8'}, True),
+        ({'LANG': 'C', 'LC_CTYPE': 'C.UTF-8'}, True),
+        # LC_ALL and LC_CTYPE take precedence over LANG
+        ({'LANG': 'en_US.UTF-8', 'LC_ALL': 'en_US.ISO-8859-1'}, False),
+        ({'LANG': 'en_US.UTF-8', 'LC_CTYPE': 'en_US.ISO-8859-1'}, False),
+        ({'LANG': 'en_US.UTF-8', 'LC_ALL': ''}, True),
+    ],
+)
+def test_environment_is_utf8(monkeypatch, env, expected):
+    import locale
+
+    for name in ('LC_ALL', 'LC_CTYPE', 'LANG'):
+        monkeypatch.delenv(name, raising=False)
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    # the locale module is only consulted if the environment does not indicate UTF-8
+    monkeypatch.setattr(locale, 'getpreferredencoding', lambda *args: 'ISO-8859-1')
+
+    _environment_is_utf8.cache_clear()
+    try:
+        assert _environment_is_utf8()[1] == expected
+    finally:
+        _environment_is_utf8.cache_clear()
+
+
+def test_owner_option():
+    parser = create_parser(active_sub='list')
+    assert parser.parse_args(['--owner', 'u:g', 'list']).owner == ('u', 'g')
+    assert parser.parse_args(['--owner', 'u', 'list']).owner == ('u', None)
+    # an empty owner is ignored, just like not passing the option at all
+    assert parser.parse_args(['--owner', '', 'list']).owner is None
+    assert parser.parse_args(['list']).owner is None
@@ -41,3 +41,44 @@ def test_container_recreate(gconfig, testing_container):
     suite, arch, variant = testing_container
     osbase = OSBase(gconfig, suite, arch, variant)
     assert osbase.recreate()
+
+
+def test_copy_helper_script_unchanged(gconfig, monkeypatch, tmp_path):
+    '''An unchanged helper script in an unpacked image is not copied again'''
+    import os
+    import shutil
+
+    from debspawn.utils.zstd_tar import compress_directory, decompress_tarball
+
+    # use a helper script with a sub-second mtime, which tarballs can not store
+    src_script = tmp_path / 'dsrun'
+    src_script.write_text('#!/usr/bin/python3\n')
+    os.utime(src_script, ns=(1600000000_332746788, 1600000000_332746788))
+    monkeypatch.setattr(gconfig, 'dsrun_path', str(src_script))
+
+    osbase = OSBase(gconfig, 'stable', 'amd64')
+    root_dir = tmp_path / 'root'
+    root_dir.mkdir()
+    osbase._copy_helper_script(str(root_dir))
+
+    # pack and unpack the image, like it happens for every new container instance
+    tarball = str(tmp_path / 'image.tar.zst')
+    compress_directory(str(root_dir), tarball)
+    instance_dir = tmp_path / 'instance'
+    instance_dir.mkdir()
+    decompress_tarball(tarball, str(instance_dir))
+
+    script_fname = instance_dir / 'usr' / 'lib' / 'debspawn' / 'dsrun'
+    assert script_fname.stat().st_mtime_ns == 1600000000_000000000
+
+    copied = []
+    real_copy2 = shutil.copy2
+    monkeypatch.setattr(shutil, 'copy2', lambda *args: copied.append(args) or real_copy2(*args))
+    osbase._copy_helper_script(str(instance_dir))
+    assert not copied
+
+    # a modified helper script is copied again
+    src_script.write_text('#!/usr/bin/python3\n# changed\n')
+    osbase._copy_helper_script(str(instance_dir))
+    assert len(copied) == 1
+    assert script_fname.read_text() == src_script.read_text()
@@ -20,7 +20,15 @@
 import os
 import tempfile
 
-from debspawn.utils.misc import umount, bindmount, is_mountpoint, rmtree_mntsafe
+import pytest
+
+from debspawn.utils.misc import (
+    umount,
+    bindmount,
+    is_mountpoint,
+    rmtree_mntsafe,
+    systemd_escape,
+)
 
 
 def test_bindmount_umount(gconfig):
@@ -71,3 +79,18 @@ def test_rmtree_mntsafe(gconfig):
     # cleanup mounted dir
     rmtree_mntsafe(mnt_tmpdir)
     assert not os.path.exists(mnt_tmpdir)
+
+
+@pytest.mark.parametrize(
+    'name,expected',
+    [
+        ('foo-bar/baz', 'foo\\x2dbar-baz'),
+        ('.hidden', '\\x2ehidden'),
+        ('a b', 'a\\x20b'),
+        ('ü', '\\xc3\\xbc'),
+        ('/leading', '-leading'),
+    ],
+)
+def test_systemd_escape(name, expected):
+    # expected values are what systemd-escape(1) returns for the given names
+    assert systemd_escape(name) == expected